@@ -10,12 +10,12 @@ functions can translate raw bytes into meaningful information.
 
 import code
 import datetime
+import io
 import struct
 import time
 from argparse import ArgumentParser
 from re import findall
 
-from requests import post
 from serial import Serial
 from serial.tools import list_ports
 
@@ -260,6 +260,10 @@ data_id = [
 
 
 
+# Bit-reversed value of every byte. The pack expects each byte MSB-first on the
+# wire, so whole frames are flipped with a single bytes.translate() call.
+reversed_bytes = bytes(int(f"{b:08b}"[::-1], 2) for b in range(256))
+
 def print_debug_bytes(data):
     data_print = " ".join(f"{byte:02X}" for byte in data)
     print(f"DEBUG: ", data_print)
@@ -378,14 +382,11 @@ class M18:
 
     def reverse_bits(self, byte):
         """Reverse the bit-order of a single byte."""
-        return int(f"{byte:08b}"[::-1], 2)
+        return reversed_bytes[byte]
 
     def checksum(self, payload):
         """Calculate a simple additive checksum for the payload."""
-        checksum = 0
-        for byte in payload:
-            checksum += byte & 0xFFFF
-        return checksum
+        return sum(payload)
 
     def add_checksum(self, lsb_command):
         """Append a big-endian checksum to a command payload."""
@@ -395,9 +396,9 @@ class M18:
     def send(self, command):
         """Transmit a raw command buffer after reversing bit order for the wire."""
         self.port.reset_input_buffer()
-        debug_print = " ".join(f"{byte:02X}" for byte in command)
-        msb = bytearray(self.reverse_bits(byte) for byte in command)
+        msb = bytes(command).translate(reversed_bytes)
         if self.PRINT_TX:
+            debug_print = " ".join(f"{byte:02X}" for byte in command)
             print(f"Sending:  {debug_print}")
         self.port.write(msb)
 
@@ -414,9 +415,9 @@ class M18:
             msb_response += self.port.read(1)
         else:
             msb_response += self.port.read(size-1)
-        lsb_response = bytearray(self.reverse_bits(byte) for byte in msb_response)
-        debug_print = " ".join(f"{byte:02X}" for byte in lsb_response)
+        lsb_response = bytearray(msb_response.translate(reversed_bytes))
         if self.PRINT_RX:
+            debug_print = " ".join(f"{byte:02X}" for byte in lsb_response)
             print(f"Received: {debug_print}")
         time.sleep(0.05)
         return lsb_response
@@ -655,7 +656,7 @@ class M18:
             print(f"read_all: Failed with error: {e}")
     
 
-    def read_id(self, id_array=None, force_refresh=True, output="label"):
+    def read_id(self, id_array=None, force_refresh=True, output="label", file=None):
         """
         Read data by ID. Default is print all
         # id_array - array of registers to print
@@ -665,13 +666,14 @@ class M18:
         #       "raw" - prints values only (for pasting into spreadsheet)
         #       "array" - returns array of [id, value]
         #       "form" - returns array of [value]
+        # file - stream to print to instead of stdout
         """
         # If empty, default is print all
         if id_array is None or len(id_array) == 0:
             id_array = range(0,len(data_id))
             
         if not ( (output == "label") or (output == "raw") or (output == "array") or (output == "form")):
-            print(f"Unrecognised 'output' = {output}. Please choose \"label\", \"raw\", or \"array\"")
+            print(f"Unrecognised 'output' = {output}. Please choose \"label\", \"raw\", or \"array\"", file=file)
             output = "label"
             
         array = []
@@ -690,10 +692,10 @@ class M18:
             now = datetime.datetime.now()
             formatted_time = now.strftime("%Y-%m-%d %H:%M:%S")
             if output == "label":
-                print(formatted_time)
-                print("ID  ADDR   LEN TYPE       LABEL                                   VALUE")
+                print(formatted_time, file=file)
+                print("ID  ADDR   LEN TYPE       LABEL                                   VALUE", file=file)
             elif output == "raw":
-                print(formatted_time)
+                print(formatted_time, file=file)
             elif output == "form":
                 array.append(formatted_time)
             
@@ -753,10 +755,10 @@ class M18:
                 
                 if output == "label":
                     # Print formatted data
-                    print(f"{i:3d} 0x{addr:04X} {length:2d} {data_type:>6}   {label:<39} {value:<}")
+                    print(f"{i:3d} 0x{addr:04X} {length:2d} {data_type:>6}   {label:<39} {value:<}", file=file)
                 elif output == "raw":
                     # Print spreadsheet format
-                    print(value)
+                    print(value, file=file)
                 elif output == "array":
                     array.append([i, array_value])
                 elif output == "form":
@@ -768,7 +770,7 @@ class M18:
                     
             self.idle()
         except Exception as e:
-            print(f"read_id: Failed with error: {e}")
+            print(f"read_id: Failed with error: {e}", file=file)
 
     
     def read_all_spreadsheet(self):
@@ -813,11 +815,12 @@ class M18:
             print(f"read_all_spreadsheet: Failed with error: {e}")
             
     
-    def health(self, force_refresh = True):
+    def health(self, force_refresh = True, file=None):
         """
         Print labelled and formatted summary of key data.
         Some data is calculated, like 'imbalance' and 'total time on tool'
         Print simple histogram of discharge stats
+        Output goes to ``file`` when given, otherwise stdout
         """
         reg_list = [
             4,  # 0.  Manufacture date
@@ -849,8 +852,8 @@ class M18:
         self.txrx_save_and_set(True)
         
         try:
-            print("Reading battery. This will take 5-10sec\n")
-            array = self.read_id(reg_list, force_refresh, "array")
+            print("Reading battery. This will take 5-10sec\n", file=file)
+            array = self.read_id(reg_list, force_refresh, "array", file)
             
             sn = array[40][1]
             numbers = findall(r'\d+\.?\d*', sn)
@@ -876,49 +879,49 @@ class M18:
                 "384": [12, "12Ah Forge (5s3p 21700 tabless)"]
             }
             bat_text = bat_lookup.get(bat_type, [0, "Unknown"])
-            print(f"Type: {bat_type} [{bat_text[1]}]")
-            print("E-serial:", e_serial, "(does NOT match case serial)")
+            print(f"Type: {bat_type} [{bat_text[1]}]", file=file)
+            print("E-serial:", e_serial, "(does NOT match case serial)", file=file)
             
             #now = datetime.datetime.now(datetime.timezone.utc)
             bat_now = array[39][1]
             
             #print("Manufacture date: ", array[0].strftime('%Y-%m-%d %H:%M:%S') )
-            print("Manufacture date:", array[0][1].strftime('%Y-%m-%d') )
-            print("Days since 1st charge:", array[1][1])
-            print("Days since last tool use:", (bat_now - array[2][1]).days )
-            print("Days since last charge:", (bat_now - array[3][1]).days )
-            print("Pack voltage:", sum(array[4][1])/1000 )
-            print("Cell Voltages (mV):", array[4][1] )
-            print("Cell Imbalance (mV):", max(array[4][1]) - min(array[4][1]) )
+            print("Manufacture date:", array[0][1].strftime('%Y-%m-%d'), file=file)
+            print("Days since 1st charge:", array[1][1], file=file)
+            print("Days since last tool use:", (bat_now - array[2][1]).days, file=file)
+            print("Days since last charge:", (bat_now - array[3][1]).days, file=file)
+            print("Pack voltage:", sum(array[4][1])/1000, file=file)
+            print("Cell Voltages (mV):", array[4][1], file=file)
+            print("Cell Imbalance (mV):", max(array[4][1]) - min(array[4][1]), file=file)
             if array[5][1]:
-                print("Temperature (deg C):", array[5][1])
+                print("Temperature (deg C):", array[5][1], file=file)
             if array[6][1]:
-                print("Temperature (deg C):", array[6][1])
+                print("Temperature (deg C):", array[6][1], file=file)
             
-            print("\nCHARGING STATS:")
-            print(f"Charge count [Redlink, dumb, (total)]: {(array[13][1])}, {(array[14][1])}, ({(array[15][1])})")
-            print("Total charge time:", array[16][1])
-            print("Time idling on charger:", array[17][1])
-            print("Low-voltage charges (any cell <2.5V):", array[18][1])
+            print("\nCHARGING STATS:", file=file)
+            print(f"Charge count [Redlink, dumb, (total)]: {(array[13][1])}, {(array[14][1])}, ({(array[15][1])})", file=file)
+            print("Total charge time:", array[16][1], file=file)
+            print("Time idling on charger:", array[17][1], file=file)
+            print("Low-voltage charges (any cell <2.5V):", array[18][1], file=file)
             
-            print("\nTOOL USE STATS:")
-            print("Total discharge (Ah):", f"{array[7][1]/3600:.2f}")
+            print("\nTOOL USE STATS:", file=file)
+            print("Total discharge (Ah):", f"{array[7][1]/3600:.2f}", file=file)
             if bat_text[0] != 0:
                 total_discharge_cycles = f"{array[7][1] / 3600 / bat_text[0]:.2f}"
             else:
                 total_discharge_cycles = 'Unknown battery type, unable to calculate'
-            print("Total discharge cycles:", total_discharge_cycles)
-            print("Times discharged to empty:", array[8][1])
-            print("Times overheated:", array[9][1])
-            print("Overcurrent events:", array[10][1])
-            print("Low-voltage events:", array[11][1])
-            print("Low-voltage bounce/stutter:", array[12][1])
+            print("Total discharge cycles:", total_discharge_cycles, file=file)
+            print("Times discharged to empty:", array[8][1], file=file)
+            print("Times overheated:", array[9][1], file=file)
+            print("Overcurrent events:", array[10][1], file=file)
+            print("Low-voltage events:", array[11][1], file=file)
+            print("Low-voltage bounce/stutter:", array[12][1], file=file)
             
             tool_time = 0
             for i in range(19,39):
                 tool_time += array[i][1]
                 
-            print("Total time on tool (>10A):", datetime.timedelta(seconds=tool_time))
+            print("Total time on tool (>10A):", datetime.timedelta(seconds=tool_time), file=file)
                 
             for i,j in enumerate(range(19,38)):
                 amp_range = f"{(i+1)*10}-{(i+2)*10}A"
@@ -927,7 +930,7 @@ class M18:
                 hhmmss = datetime.timedelta(seconds=t)
                 pct = round( (t/tool_time)*100 )
                 bar = "X" * round(pct)
-                print(label, hhmmss, f"{pct:2d}%", bar)
+                print(label, hhmmss, f"{pct:2d}%", bar, file=file)
             # Do last label different
             j += 1
             amp_range = f"> 200A"
@@ -936,15 +939,27 @@ class M18:
             hhmmss = datetime.timedelta(seconds=t)
             pct = round( (t/tool_time)*100 )
             bar = "X" * round(pct)
-            print(label, hhmmss, f"{pct:2d}%", bar)
+            print(label, hhmmss, f"{pct:2d}%", bar, file=file)
                 
         except Exception as e:
-            print(f"health: Failed with error: {e}")
-            print("Check battery is connected and you have correct serial port")
+            print(f"health: Failed with error: {e}", file=file)
+            print("Check battery is connected and you have correct serial port", file=file)
             
         # restore debug status
         self.txrx_restore()
 
+    def health_str(self, force_refresh = True):
+        """Return the :meth:`health` report as a string instead of printing it."""
+        buf = io.StringIO()
+        self.health(force_refresh, file=buf)
+        return buf.getvalue()
+
+    def read_id_str(self, id_array=None, force_refresh=True, output="label"):
+        """Return the printed output of :meth:`read_id` as a string."""
+        buf = io.StringIO()
+        self.read_id(id_array, force_refresh, output, file=buf)
+        return buf.getvalue()
+
 
 
     def submit_form(self):
@@ -994,7 +1009,8 @@ class M18:
             "entry.716337020": s_output
         }
 
-        # Submit the form
+        # Submit the form (requests is only needed here, so import it lazily)
+        from requests import post
         response = post(form_url, data=form_data)
 
         # Check response
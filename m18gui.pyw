@@ -1,26 +1,76 @@
 """Tkinter-based GUI wrapper around the :mod:`m18` protocol module."""
 
-import sys, subprocess, threading, io, time, traceback, tkinter as tk
+import sys, subprocess, threading, queue, time, traceback, importlib.util, collections, contextlib, tkinter as tk
+from dataclasses import dataclass
+from functools import lru_cache
 from tkinter import ttk, messagebox
 
 def ensure_module(mod_name, pip_name):
-    """Import ``mod_name``, installing ``pip_name`` via pip if missing."""
-    try: __import__(mod_name)
-    except ImportError:
+    """Make ``mod_name`` importable, installing ``pip_name`` via pip if missing."""
+    if importlib.util.find_spec(mod_name) is None:
         root = tk.Tk(); root.title("Installing dependencies")
         ttk.Label(root, text=f"Installing {pip_name}…").pack(padx=6, pady=6)
         pb = ttk.Progressbar(root, mode="indeterminate"); pb.pack(fill="x", padx=6, pady=(0, 6)); pb.start(12)
-        root.update_idletasks()
-        subprocess.check_call([sys.executable, "-m", "pip", "install", pip_name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        pb.stop(); root.destroy()
+        # Tk's own mainloop keeps the progress bar animating while pip runs; poll it every 50 ms.
+        proc = subprocess.Popen([sys.executable, "-m", "pip", "install", pip_name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        def check():
+            if proc.poll() is None: root.after(50, check)
+            else: root.quit()
+        root.protocol("WM_DELETE_WINDOW", lambda: None)  # not closable mid-install
+        root.after(50, check); root.mainloop()
+        pb.stop(); root.destroy(); importlib.invalidate_caches()
+        if proc.returncode != 0: messagebox.showerror("Error", f"Failed to install {pip_name}."); sys.exit(1)
         try: __import__(mod_name)
         except ImportError: messagebox.showerror("Error", f"Installed {pip_name} but cannot import."); sys.exit(1)
+
 ensure_module("serial", "pyserial")
-from serial.tools import list_ports
-import m18
+
+@dataclass(slots=True)
+class ChargerOverride:
+    """Charger currents (raw units) to advertise during a simulation."""
+    cutoff_current: int
+    max_current: int
+
+@contextlib.contextmanager
+def override_charger(m, override):
+    """Apply ``override`` to ``m`` for the duration of the block, always restoring the previous values."""
+    old = (m.CUTOFF_CURRENT, m.MAX_CURRENT)
+    m.CUTOFF_CURRENT, m.MAX_CURRENT = override.cutoff_current, override.max_current
+    try: yield
+    finally: m.CUTOFF_CURRENT, m.MAX_CURRENT = old
+
+def _safe_int(s, lo=0, hi=20000):
+    """Parse a non-negative integer field, returning ``None`` if empty, malformed or outside ``[lo, hi]``."""
+    s = s.strip()
+    if not s.isdecimal(): return None  # isdigit() also accepts e.g. "²", which int() rejects
+    v = int(s)
+    return v if lo <= v <= hi else None
+
+def _safe_float(s, lo=0.0, hi=float("inf")):
+    """Parse a float field, returning ``None`` if empty, malformed or outside ``[lo, hi]``."""
+    try: v = float(s)
+    except (ValueError, TypeError): return None
+    return v if lo <= v <= hi else None
+
+class _ListIO:
+    """Minimal write-only stream that collects chunks in a list; join once when done."""
+    def __init__(self): self.buf = []
+    def write(self, s): self.buf.append(s); return len(s)
+    def flush(self): pass
+    def getvalue(self): return "".join(self.buf)
+
+@lru_cache(maxsize=32)
+def _compile_console(src):
+    """Compile console input, using "eval" mode for single expressions so their value can be echoed."""
+    try: return compile(src, "<console>", "eval")
+    except SyntaxError: return compile(src, "<console>", "exec")
 
 class M18GUI(tk.Tk):
     """Simple desktop interface for performing common M18 operations."""
+    MAX_OUTPUT_LINES = 2000  # scrollback kept in the output pane
+    LOG_FLUSH_BYTES = 64 * 1024  # cap on text written to the output pane per flush
+    INTERVAL_MAP = {"1200": 1.0, "2400": 0.75, "4800": 0.5, "9600": 0.25}  # keepalive interval (s) per sim baudrate
+    SIM_PROFILES = {"Gentle": (150, 2500), "Normal": (300, 6000), "Aggressive": (450, 9000)}  # (cutoff, max) raw currents
     def __init__(self):
         super().__init__()
         self.title("M18 Protocol GUI")
@@ -29,19 +79,35 @@ class M18GUI(tk.Tk):
         self.m18_obj = None
         self.sim_thread = None
         self.sim_stop_event = None
-        self.sim_profiles = {"Gentle": (150, 2500), "Normal": (300, 6000), "Aggressive": (450, 9000)}
+        self._profile_info_cache = {p: f"Profile '{p}': Cutoff {c} ({c/1000:.2f}A), Max {m} ({m/1000:.2f}A). Simulation only."
+                                    for p, (c, m) in self.SIM_PROFILES.items()}
+        self._last_profile_rendered = None
         self.custom_cutoff_raw_var = tk.StringVar(value="300")
         self.custom_cutoff_amps_var = tk.StringVar(value="0.30")
         self.custom_max_raw_var = tk.StringVar(value="6000")
         self.custom_max_amps_var = tk.StringVar(value="6.00")
-        self._sync_in_progress = False
         self.port_map = {}
+        self._ports_cache = (float("-inf"), [])
+        self._ports_scanning = False
+        self._ports_sig = None
+        self._list_ports = None
+        self._m18 = None
+        self._log_buf = collections.deque()
+        self._log_flush_scheduled = False
+        self._pending_vars = {}
+        self._var_flush_scheduled = False
+        self._stdout_lock = threading.Lock()
+        self._ui_q = queue.Queue()  # (callable, args) posted by worker threads via _ui()
+        self._io_q = None  # job queue of the per-connection device I/O thread
+        self._io_pending = 0  # jobs queued or running on it
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.create_widgets()
         self.refresh_ports()
         self.update_profile_display()
+        self.after(50, self._pump_ui_queue)
 
     def create_widgets(self):
-        """Build all tabs, controls, and shared output areas."""
+        """Build the notebook, main and simulation tabs, and shared output area."""
         self.notebook = ttk.Notebook(self); self.notebook.pack(fill="both", expand=True, padx=0, pady=0)
         self.main_tab, self.console_tab, self.sim_tab, self.about_tab = (ttk.Frame(self.notebook) for _ in range(4))
         self.notebook.add(self.main_tab, text="Main Controls"); self.notebook.add(self.console_tab, text="Interactive Console")
@@ -57,28 +123,20 @@ class M18GUI(tk.Tk):
         self.disconnect_btn = ttk.Button(top, text="Disconnect", width=9, command=self.disconnect_device, state="disabled"); self.disconnect_btn.grid(row=0, column=4, padx=2)
         self.status_var = tk.StringVar(value="Not connected")
         ttk.Label(top, textvariable=self.status_var).grid(row=1, column=0, columnspan=5, sticky="w", pady=(2,0))
+        self.connect_pb = ttk.Progressbar(top, mode="indeterminate", length=120)
+        self.connect_pb.grid(row=1, column=3, columnspan=2, sticky="e", pady=(2,0)); self.connect_pb.grid_remove()
         cmds = ttk.LabelFrame(self.main_tab, text="Commands"); cmds.pack(fill="x", padx=5, pady=(3,1))
         self.idle_btn = ttk.Button(cmds, text="Idle (TX low, safe to connect)", width=25, command=self.cmd_idle, state="disabled"); self.idle_btn.grid(row=0, column=0, padx=2, pady=2)
         self.health_btn = ttk.Button(cmds, text="Health report", width=15, command=self.cmd_health, state="disabled"); self.health_btn.grid(row=0, column=1, padx=2, pady=2)
         self.clipboard_btn = ttk.Button(cmds, text="Copy all registers to clipboard", width=28, command=self.cmd_clipboard, state="disabled"); self.clipboard_btn.grid(row=0, column=2, padx=2, pady=2)
         # Output (only on non-About tabs)
         self.bottom_frame = ttk.LabelFrame(self, text="Output"); self.bottom_frame.pack(fill="x", padx=5, pady=(0,4), side="bottom")
-        self.output_text = tk.Text(self.bottom_frame, wrap="word", height=6, font=("Consolas", 9)); self.output_text.pack(fill="both", expand=True, padx=2, pady=2)
+        self.output_text = tk.Text(self.bottom_frame, wrap="word", height=6, font=("Consolas", 9), undo=False, autoseparators=False, maxundo=0); self.output_text.pack(fill="both", expand=True, padx=2, pady=2)
         scrollbar = ttk.Scrollbar(self.bottom_frame, orient="vertical", command=self.output_text.yview); scrollbar.pack(side="right", fill="y")
         self.output_text.configure(yscrollcommand=scrollbar.set)
-        def on_tab_changed(event):
-            tab = event.widget.tab(event.widget.select(), "text")
-            if tab == "About": self.bottom_frame.pack_forget()
-            else: self.bottom_frame.pack(fill="x", padx=5, pady=(0,4), side="bottom")
-        self.notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
-
-        # Console Tab
-        c_frame = ttk.Frame(self.console_tab); c_frame.pack(fill="both", expand=True, padx=4, pady=2)
-        ttk.Label(c_frame, text="Python console. Use 'm' for M18 object.").pack(anchor="w", pady=(0,1))
-        self.console_text = tk.Text(c_frame, height=4, wrap="none", font=("Consolas",9)); self.console_text.pack(fill="x", padx=1, pady=(0,1))
-        c_btns = ttk.Frame(c_frame); c_btns.pack(fill="x")
-        ttk.Button(c_btns, text="Execute", width=10, command=self.run_console_code).pack(side="left", padx=3)
-        ttk.Button(c_btns, text="Clear", width=7, command=lambda: self.console_text.delete("1.0", tk.END)).pack(side="left", padx=3)
+        self._log_insert, self._log_see = self.output_text.insert, self.output_text.see  # bound once for _flush_log
+        self._built_tabs = set()
+        self.notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
         # Simulation Tab
         s_frame = ttk.Frame(self.sim_tab); s_frame.pack(fill="both", padx=4, pady=1)
@@ -87,14 +145,12 @@ class M18GUI(tk.Tk):
         ttk.Entry(s_frame, textvariable=self.sim_duration_var, width=5).grid(row=0, column=1, sticky="w", padx=2)
         ttk.Label(s_frame, text="Sim baudrate (concept):").grid(row=1, column=0, sticky="w", padx=2)
         self.sim_baud_var = tk.StringVar(value="4800")
-        ttk.Combobox(s_frame, textvariable=self.sim_baud_var, state="readonly", width=8, values=["1200","2400","4800","9600"]).grid(row=1, column=1, sticky="w", padx=2)
+        ttk.OptionMenu(s_frame, self.sim_baud_var, "4800", *self.INTERVAL_MAP).grid(row=1, column=1, sticky="w", padx=2)
         ttk.Label(s_frame, text="UART to pack always runs at 4800 baud.\nNo real charging current flows from USB.").grid(row=2, column=0, columnspan=2, sticky="w", padx=2, pady=(0,6))
         ttk.Label(s_frame, text="Charger profile:").grid(row=3, column=0, sticky="w", padx=2)
         self.sim_profile_var = tk.StringVar(value="Normal")
-        profs = list(self.sim_profiles.keys())+["Custom"]
-        prof_box = ttk.Combobox(s_frame, textvariable=self.sim_profile_var, state="readonly", width=10, values=profs)
-        prof_box.grid(row=3, column=1, sticky="w", padx=2)
-        prof_box.bind("<<ComboboxSelected>>", self.on_profile_changed)
+        ttk.OptionMenu(s_frame, self.sim_profile_var, "Normal", *self.SIM_PROFILES, "Custom",
+                       command=self.on_profile_changed).grid(row=3, column=1, sticky="w", padx=2)
         self.profile_info_var = tk.StringVar()
         ttk.Label(s_frame, textvariable=self.profile_info_var, foreground="blue").grid(row=4, column=0, columnspan=2, sticky="w", padx=2, pady=(0,2))
         self.sim_status_var = tk.StringVar(value="Simulation idle. Connect to a battery to enable.")
@@ -103,18 +159,39 @@ class M18GUI(tk.Tk):
         self.sim_start_btn.grid(row=6, column=0, padx=2, pady=2)
         self.sim_stop_btn = ttk.Button(s_frame, text="Stop simulation", width=15, command=self.stop_simulation, state="disabled")
         self.sim_stop_btn.grid(row=6, column=1, padx=2, pady=2)
+        self.sim_tick_var = tk.StringVar()
+        ttk.Label(s_frame, textvariable=self.sim_tick_var, foreground="gray").grid(row=7, column=0, columnspan=2, sticky="w", padx=2)
+
+    def _on_tab_changed(self, event):
+        """Build Console/About tabs on first view and hide the output pane on About."""
+        tab = event.widget.tab(event.widget.select(), "text")
+        if tab not in self._built_tabs:
+            self._built_tabs.add(tab)
+            if tab == "Interactive Console": self._build_console_tab()
+            elif tab == "About": self._build_about_tab()
+        if tab == "About": self.bottom_frame.pack_forget()
+        else: self.bottom_frame.pack(fill="x", padx=5, pady=(0,4), side="bottom")
+
+    def _build_console_tab(self):
+        """Create the Interactive Console widgets (deferred until the tab is first shown)."""
+        c_frame = ttk.Frame(self.console_tab); c_frame.pack(fill="both", expand=True, padx=4, pady=2)
+        ttk.Label(c_frame, text="Python console. Use 'm' for M18 object.").pack(anchor="w", pady=(0,1))
+        self.console_text = tk.Text(c_frame, height=4, wrap="none", font=("Consolas",9), undo=False, autoseparators=False, maxundo=0); self.console_text.pack(fill="x", padx=1, pady=(0,1))
+        c_btns = ttk.Frame(c_frame); c_btns.pack(fill="x")
+        self.console_run_btn = ttk.Button(c_btns, text="Execute", width=10, command=self.run_console_code); self.console_run_btn.pack(side="left", padx=3)
+        ttk.Button(c_btns, text="Clear", width=7, command=lambda: self.console_text.delete("1.0", tk.END)).pack(side="left", padx=3)
 
-        # About Tab
-        import webbrowser
+    def _build_about_tab(self):
+        """Create the About tab widgets (deferred until the tab is first shown)."""
         a_frame = ttk.Frame(self.about_tab)
         a_frame.place(relx=0.5, rely=0.09, anchor="n")
         ttk.Label(a_frame, text="M18 Protocol GUI", font=("Segoe UI", 15, "bold")).pack(pady=(0,1))
         ttk.Label(a_frame, text="Core protocol by Martin Jansson", font=("Segoe UI", 9, "italic")).pack(pady=(5,0))
         link2 = ttk.Label(a_frame, text="Original: https://github.com/mnh-jansson/m18-protocol", foreground="blue", cursor="hand2"); link2.pack()
-        link2.bind("<Button-1>", lambda e: webbrowser.open("https://github.com/mnh-jansson/m18-protocol"))
+        link2.bind("<Button-1>", lambda e: self._open_url("https://github.com/mnh-jansson/m18-protocol"))
         ttk.Label(a_frame, text="Developed by KillaVolt", font=("Segoe UI", 9)).pack()
         link = ttk.Label(a_frame, text="GitHub Profile: https://github.com/KillaVolt", foreground="blue", cursor="hand2"); link.pack()
-        link.bind("<Button-1>", lambda e: webbrowser.open("https://github.com/KillaVolt"))
+        link.bind("<Button-1>", lambda e: self._open_url("https://github.com/KillaVolt"))
 
         table = ttk.Treeview(a_frame, columns=("addr", "desc"), show="headings", height=8)
         table.heading("addr", text="Hex Addr"); table.heading("desc", text="Meaning")
@@ -122,10 +199,51 @@ class M18GUI(tk.Tk):
         for addr, desc in [("F85D","1: Command"),("F85E","4: Access"),("F85F","3: Length"),("F860","Address?"),("F861","Address?"),("F862","Length?"),("F863","N/A"),("F864","Checksum")]:
             table.insert("", "end", values=(addr,desc))
 
+    def _open_url(self, url):
+        """Open ``url`` in the default browser, importing :mod:`webbrowser` only when a link is clicked."""
+        import webbrowser
+        webbrowser.open(url)
+
     # -------- Utility / Port / Logging ----------
     def log(self, text, clear=False):
-        """Append ``text`` to the shared output area, optionally clearing it."""
-        self.output_text.delete("1.0", tk.END) if clear else None; self.output_text.insert(tk.END, text + "\n"); self.output_text.see(tk.END)
+        """Queue ``text`` for the shared output area, optionally clearing it first."""
+        if clear: self._log_buf.clear(); self.output_text.delete("1.0", tk.END)
+        self._log_buf.append(text)
+        if not self._log_flush_scheduled: self._log_flush_scheduled = True; self.after(100, self._flush_log)
+
+    def log_lines(self, text):
+        """Queue multi-line ``text`` one line per entry so scrollback trimming stays line-accurate."""
+        self._log_buf.extend(text.rstrip("\n").split("\n"))
+        if not self._log_flush_scheduled: self._log_flush_scheduled = True; self.after(100, self._flush_log)
+
+    def _flush_log(self):
+        """Write queued log lines with one ``insert`` and a single ``see``, at most ~64 KB per call."""
+        self._log_flush_scheduled = False
+        if not self._log_buf: return
+        buf, chunk, size = self._log_buf, [], 0
+        while buf and size < self.LOG_FLUSH_BYTES:
+            line = buf.popleft(); chunk.append(line); size += len(line) + 1
+        self._log_insert("end", "\n".join(chunk) + "\n")
+        if buf: self._log_flush_scheduled = True; self.after(100, self._flush_log)  # rest goes out next tick
+        line_count = int(self.output_text.index("end-1c").split(".")[0])
+        # Text always ends in "\n", so end-1c sits on an empty last line: line_count is log lines + 1.
+        if line_count > self.MAX_OUTPUT_LINES: self.output_text.delete("1.0", f"{line_count - self.MAX_OUTPUT_LINES}.0")
+        self._log_see("end")
+
+    def _ui(self, fn, *args):
+        """Thread-safe: run ``fn(*args)`` on the Tk thread at the next queue pump."""
+        self._ui_q.put((fn, args))
+
+    def _pump_ui_queue(self):
+        """Run up to 64 callbacks queued by worker threads, then reschedule."""
+        try:
+            for _ in range(64):
+                try: fn, args = self._ui_q.get_nowait()
+                except queue.Empty: break
+                try: fn(*args)
+                except Exception: self.report_callback_exception(*sys.exc_info())  # one bad callback must not stop the pump
+            if self._log_buf: self._flush_log()  # one insert per tick for everything just drained
+        finally: self.after(50, self._pump_ui_queue)
 
     def sim_log(self, text):
         """Prefix simulation messages to distinguish them in the log area."""
@@ -133,15 +251,61 @@ class M18GUI(tk.Tk):
 
     def set_status(self, text):
         """Update the status label at the top of the UI."""
-        self.status_var.set(text)
+        self._schedule_var(self.status_var, text)
+
+    def set_sim_status(self, text):
+        """Update the status line on the Simulation tab."""
+        self._schedule_var(self.sim_status_var, text)
+
+    def _schedule_var(self, var, text):
+        """Coalesce label writes: only the last value set before the next idle tick is painted."""
+        self._pending_vars[str(var)] = (var, text)  # keyed by Tcl name; Variable isn't hashable
+        if not self._var_flush_scheduled:
+            self._var_flush_scheduled = True
+            self.after_idle(self._flush_vars)
+
+    def _flush_vars(self):
+        """Write each pending label value once."""
+        self._var_flush_scheduled = False
+        pending, self._pending_vars = self._pending_vars, {}
+        for var, text in pending.values(): var.set(text)
 
     def refresh_ports(self):
-        """Enumerate available serial ports and repopulate the dropdown."""
-        ports = list_ports.comports(); names = []; self.port_map.clear()
-        for p in ports:
-            label = f"{p.device} — {p.description} ({getattr(p,'manufacturer','') or ''})".strip()
-            names.append(label); self.port_map[label] = p.device
-        self.port_combo["values"] = names; self.port_combo.current(0) if names else self.port_combo.set("")
+        """Repopulate the port dropdown, enumerating on a worker thread unless recently cached."""
+        stamp, pairs = self._ports_cache
+        if time.monotonic() - stamp < 2.0: self._apply_ports(pairs); return
+        if self._ports_scanning: return  # the scan in flight will fill the dropdown
+        self._ports_scanning = True; self.set_status("Scanning ports…")
+        threading.Thread(target=self._scan_ports, daemon=True).start()
+
+    def _scan_ports(self):
+        """Worker: enumerate serial ports and hand ``(label, device)`` pairs to the Tk thread."""
+        if self._list_ports is None:
+            try: from serial.tools import list_ports as lp
+            except ImportError as e:
+                self._ports_scanning = False; self._ui(self.set_status, "Port scan failed")
+                self._ui(messagebox.showerror, "Import error", f"Cannot load pyserial.\n\n{e}"); return
+            self._list_ports = lp
+        try:
+            pairs = [(f"{p.device} — {p.description} ({getattr(p,'manufacturer','') or ''})".strip(), p.device)
+                     for p in self._list_ports.comports()]
+        except Exception as e:  # WMI/sysfs failures; never leave _ports_scanning stuck on
+            self._ui(self._ports_scan_failed, str(e)); return
+        self._ui(self._apply_ports, pairs, True)
+
+    def _ports_scan_failed(self, err):
+        """Allow another Refresh after enumeration raised."""
+        self._ports_scanning = False
+        self.set_status("Port scan failed"); self.log(f"Port scan failed: {err}")
+
+    def _apply_ports(self, pairs, cache=False):
+        """Fill the dropdown from ``(label, device)`` pairs, optionally caching them."""
+        if cache: self._ports_cache = (time.monotonic(), pairs); self._ports_scanning = False
+        sig = tuple(pairs)  # labels carry device, description and manufacturer
+        if sig != self._ports_sig:  # leave the dropdown (and the user's selection) alone when nothing changed
+            self._ports_sig = sig
+            self.port_map = dict(pairs); names = [label for label, _ in pairs]
+            self.port_combo["values"] = names; self.port_combo.current(0) if names else self.port_combo.set("")
         self.set_status("Ports refreshed")
 
     def require_connection(self):
@@ -149,81 +313,163 @@ class M18GUI(tk.Tk):
         if self.m18_obj is None: messagebox.showwarning("Not connected", "Please connect to a port first."); return False
         return True
 
-    def capture_output(self, func, *a, **k):
-        """Run ``func`` while capturing stdout into a string."""
-        buf, old = io.StringIO(), sys.stdout
-        try: sys.stdout = buf; func(*a, **k)
-        finally: sys.stdout = old
-        return buf.getvalue()
+    def on_close(self):
+        """Stop background work and close the window."""
+        self.stop_simulation()
+        self._stop_io_worker()  # daemon thread, so a long-running job can't keep the process alive
+        self.destroy()
 
     # --------- Connect/Disconnect -----------
     def connect_device(self):
-        """Instantiate :class:`m18.M18` using the selected serial port."""
+        """Instantiate :class:`m18.M18` for the selected serial port on a worker thread."""
         sel = self.port_var.get()
         port = self.port_map.get(sel, sel)
-        try: self.m18_obj = m18.M18(port)
-        except Exception as e:
-            self.m18_obj = None; messagebox.showerror("Connection error", f"Failed to connect to {port}.\n\n{e}")
-            self.set_status("Connection failed"); return
+        if self._m18 is None:
+            try: import m18
+            except ImportError as e: messagebox.showerror("Import error", f"Cannot load the m18 module.\n\n{e}"); return
+            self._m18 = m18
+        self.connect_btn.configure(state="disabled"); self.set_status(f"Connecting to {port}…")
+        self.connect_pb.grid(); self.connect_pb.start(15)
+        self._start_io_worker(); self._io(self._connect_worker, port)
+
+    def _connect_worker(self, port):
+        """Worker: open the port (which may block on slow adapters) and report back to the Tk thread."""
+        try: obj = self._m18.M18(port)
+        except Exception as e: self._ui(self._connect_failed, port, str(e))
+        else: self._ui(self._connect_done, obj, port)
+
+    def _connect_done(self, obj, port):
+        """Adopt the new connection and enable the device controls."""
+        self.connect_pb.stop(); self.connect_pb.grid_remove()
+        self.m18_obj = obj
         self.set_status(f"Connected to {port}"); self.log(f"Connected to {port}", clear=True)
-        for b in [self.connect_btn]: b.configure(state="disabled")
-        for b in [self.disconnect_btn, self.idle_btn, self.health_btn, self.clipboard_btn, self.sim_start_btn]: b.configure(state="normal")
+        self._set_states([(self.connect_btn, "disabled")] +
+                         [(b, "normal") for b in (self.disconnect_btn, self.idle_btn, self.health_btn, self.clipboard_btn, self.sim_start_btn)])
+
+    def _connect_failed(self, port, err):
+        """Report a failed connection attempt and allow retrying."""
+        self.connect_pb.stop(); self.connect_pb.grid_remove()
+        self._stop_io_worker()
+        messagebox.showerror("Connection error", f"Failed to connect to {port}.\n\n{err}")
+        self.set_status("Connection failed"); self.connect_btn.configure(state="normal")
 
     def disconnect_device(self):
         """Return the pack to idle, close the port, and reset UI state."""
         self.stop_simulation()
-        if self.m18_obj:
-            try: self.m18_obj.idle()
-            except: pass
-            try: self.m18_obj.port.close()
-            except: pass
-            self.m18_obj = None
+        m, self.m18_obj = self.m18_obj, None  # no new commands can start from here on
+        self._set_states([(b, "disabled") for b in (self.connect_btn, self.disconnect_btn, self.idle_btn, self.health_btn,
+                                                    self.clipboard_btn, self.sim_start_btn, self.sim_stop_btn)])
+        if m is None: self._disconnect_done(); return
+        self.set_status("Disconnecting…")
+        # Teardown queues behind any in-flight command; the I/O thread exits once it has run.
+        self._io(self._disconnect_worker, m, self.sim_thread); self._stop_io_worker()
+
+    def _disconnect_worker(self, m, sim_thread=None):
+        """Worker: idle the pack and close the port off the Tk thread; a hung adapter only stalls this thread."""
+        if sim_thread is not None: sim_thread.join()  # already told to stop; let it finish its own idle() first
+        try: m.idle()
+        except Exception as e: self._ui(self.log, f"idle() on disconnect failed: {e}")
+        try: m.port.close()
+        except Exception as e: self._ui(self.log, f"Closing port failed: {e}")
+        self._ui(self._disconnect_done)
+
+    def _disconnect_done(self):
+        """Re-enable Connect once the port has been released."""
         self.set_status("Disconnected"); self.log("Disconnected")
-        for b in [self.connect_btn]: b.configure(state="normal")
-        for b in [self.disconnect_btn, self.idle_btn, self.health_btn, self.clipboard_btn, self.sim_start_btn, self.sim_stop_btn]: b.configure(state="disabled")
+        self.connect_btn.configure(state="normal")
+
+    def _start_io_worker(self):
+        """Start the daemon thread that runs this connection's device I/O jobs one at a time."""
+        self._io_q = queue.Queue()
+        threading.Thread(target=self._io_loop, args=(self._io_q,), name="m18-io", daemon=True).start()
+
+    def _stop_io_worker(self):
+        """Let the I/O thread exit after the jobs already queued."""
+        if self._io_q is not None: self._io_q.put(None); self._io_q = None
+
+    def _io(self, fn, *args):
+        """Queue ``fn(*args)`` on the device I/O thread (call from the Tk thread)."""
+        self._io_pending += 1; self._io_q.put((fn, args))
+
+    def _io_loop(self, q):
+        """Worker: run queued ``(fn, args)`` jobs in order until the ``None`` sentinel."""
+        for fn, args in iter(q.get, None):
+            try: fn(*args)
+            except Exception: traceback.print_exc()
+            finally: self._ui(self._io_job_done)
+
+    def _io_job_done(self):
+        """Count down a finished I/O job (runs on the Tk thread)."""
+        self._io_pending -= 1
+
+    def _sim_running(self):
+        """True while the simulation thread is driving the port."""
+        return self.sim_thread is not None and self.sim_thread.is_alive()
+
+    def _cmd_btns(self):
+        """Buttons that queue device I/O; the console's only exists once its tab was opened."""
+        btns = [self.idle_btn, self.health_btn, self.clipboard_btn]
+        if hasattr(self, "console_run_btn"): btns.append(self.console_run_btn)
+        return btns
+
+    def _set_states(self, pairs):
+        """Apply ``(widget, state)`` pairs in one pass so the change lands in a single repaint."""
+        for w, state in pairs: w.configure(state=state)
 
     # ----------- Command Handlers -----------
     def cmd_idle(self):
         """Invoke ``idle`` on the connected device in a worker thread."""
         if not self.require_connection(): return
-        def work():
+        def work(m):
             try:
-                self.m18_obj.idle()
-                self.after(0, lambda: self.log("TX now low (<1V). Safe to connect battery."))
-                self.after(0, lambda: self.set_status("Idle (TX low)"))
+                m.idle()
+                self._ui(self.log, "TX now low (<1V). Safe to connect battery.")
+                self._ui(self.set_status, "Idle (TX low)")
             except Exception as e:
-                self.after(0, lambda: messagebox.showerror("Idle error", str(e)))
-        threading.Thread(target=work, daemon=True).start()
+                self._ui(messagebox.showerror, "Idle error", str(e))
+        self._io(work, self.m18_obj)
 
     def cmd_health(self):
         """Run ``health`` and display captured output."""
         if not self.require_connection(): return
-        def work():
+        def work(m):
             try:
-                output = self.capture_output(self.m18_obj.health)
-                def finish():
-                    self.log("=== Health report ===", clear=True)
-                    self.log(output)
-                    self.set_status("Health report complete")
-                self.after(0, finish)
+                self._ui(self._finish_health, m.health_str())
             except Exception as e:
-                self.after(0, lambda: messagebox.showerror("Health error", str(e)))
-        threading.Thread(target=work, daemon=True).start()
+                self._ui(messagebox.showerror, "Health error", str(e))
+            finally: self._ui(self._release_cmd_btn, self.health_btn)
+        self.health_btn.configure(state="disabled"); self._io(work, self.m18_obj)
 
     def cmd_clipboard(self):
         """Copy all register values to the clipboard."""
         if not self.require_connection(): return
-        def work():
+        def work(m):
             try:
-                output = self.capture_output(self.m18_obj.read_id, None, True, "raw")
-                def finish():
-                    self.clipboard_clear()
-                    self.clipboard_append(output)
-                    self.log("Register data copied to clipboard")
-                self.after(0, finish)
+                self._ui(self._finish_clipboard, m.read_id_str(None, True, "raw"))
             except Exception as e:
-                self.after(0, lambda: messagebox.showerror("Clipboard error", str(e)))
-        threading.Thread(target=work, daemon=True).start()
+                self._ui(messagebox.showerror, "Clipboard error", str(e))
+            finally: self._ui(self._release_cmd_btn, self.clipboard_btn)
+        self.clipboard_btn.configure(state="disabled"); self._io(work, self.m18_obj)
+
+    def _finish_health(self, output):
+        """Show a finished health report in one UI callback."""
+        self.log("=== Health report ===", clear=True)
+        self.log_lines(output)
+        self.set_status("Health report complete")
+
+    def _finish_clipboard(self, output):
+        """Put the register dump on the clipboard.
+
+        Always hand over the whole text in one ``clipboard_append``: per-line appends
+        re-copy the growing selection each time.
+        """
+        self.clipboard_clear()
+        self.clipboard_append(output)
+        self.log("Register data copied to clipboard")
+
+    def _release_cmd_btn(self, btn):
+        """Re-enable a command button after its worker finishes, unless since disconnected."""
+        if self.m18_obj is not None: btn.configure(state="normal")
 
     # ---------- Interactive Console ----------
     def run_console_code(self):
@@ -231,55 +477,59 @@ class M18GUI(tk.Tk):
         code = self.console_text.get("1.0", tk.END).strip()
         if not code: messagebox.showinfo("No code", "Please enter some code."); return
         if not self.require_connection(): return
-        def work():
-            buf = io.StringIO(); old_stdout, old_stderr = sys.stdout, sys.stderr
-            sys.stdout = sys.stderr = buf
-            try:
-                env = {"m": self.m18_obj}
-                try: exec(code, env, {})
-                except Exception: traceback.print_exc()
-            finally: sys.stdout, sys.stderr = old_stdout, old_stderr
+        if self._sim_running(): messagebox.showinfo("Simulation running", "Stop the simulation before using the console."); return
+        try: co = _compile_console(code)
+        except (SyntaxError, ValueError) as e: messagebox.showerror("Syntax error", str(e)); return
+        def work(m):
+            buf = _ListIO()
+            with self._stdout_lock:
+                old_stdout, old_stderr = sys.stdout, sys.stderr
+                sys.stdout = sys.stderr = buf
+                try:
+                    env = {"m": m}
+                    try:
+                        result = eval(co, env)  # one namespace, so snippet-level defs see each other; None for "exec"-mode code
+                        if result is not None: print(repr(result))
+                    except Exception: traceback.print_exc()
+                finally: sys.stdout, sys.stderr = old_stdout, old_stderr
             output = buf.getvalue()
             def finish():
                 self.log("=== Console execution ===")
-                self.log(output if output.strip() else "(no output)")
-            self.after(0, finish)
-        threading.Thread(target=work, daemon=True).start()
+                self.log_lines(output if output.strip() else "(no output)")
+                self.console_run_btn.configure(state="normal")
+            self._ui(finish)
+        self.console_run_btn.configure(state="disabled"); self._io(work, self.m18_obj)
 
     # ---------- Profile Display ----------
-    def on_profile_changed(self, event=None): self.update_profile_display()
+    def on_profile_changed(self, _value=None): self.update_profile_display()
     def update_profile_display(self):
         """Show human readable info about the selected simulation profile."""
         p = self.sim_profile_var.get()
-        if p in self.sim_profiles:
-            c, m = self.sim_profiles[p]
-            info = f"Profile '{p}': Cutoff {c} ({c/1000:.2f}A), Max {m} ({m/1000:.2f}A). Simulation only."
-            self.profile_info_var.set(info)
+        if p == self._last_profile_rendered: return  # OptionMenu re-fires on re-selecting the same entry
+        self._last_profile_rendered = p
+        if p in self._profile_info_cache: self.profile_info_var.set(self._profile_info_cache[p])
         else: self.profile_info_var.set("Custom profile: adjust fields below.")
     def get_profile_currents(self):
         """Return cutoff and max currents based on profile or custom fields."""
         p = self.sim_profile_var.get()
-        if p in self.sim_profiles: return self.sim_profiles[p]
-        try:
-            c = int(self.custom_cutoff_raw_var.get())
-            m = int(self.custom_max_raw_var.get())
-            if c < 0 or m <= 0 or c > 20000 or m > 20000: raise ValueError
-        except: raise ValueError("Invalid custom values.")
+        if p in self.SIM_PROFILES: return self.SIM_PROFILES[p]
+        c = _safe_int(self.custom_cutoff_raw_var.get())
+        m = _safe_int(self.custom_max_raw_var.get(), lo=1)
+        if c is None or m is None: raise ValueError("Invalid custom values.")
         return c, m
 
     # ---------- Simulation ----------
     def start_simulation(self):
         """Spawn a background thread to perform the charging dialogue."""
         if not self.require_connection(): return
-        if self.sim_thread and self.sim_thread.is_alive():
+        if self._sim_running():
             messagebox.showinfo("Running", "Simulation already running."); return
-        try:
-            duration = float(self.sim_duration_var.get())
-            if duration <= 0: raise ValueError
-        except: messagebox.showwarning("Invalid duration", "Enter a positive number."); return
+        if self._io_pending:  # the sim drives the port from its own thread; don't interleave with a command
+            messagebox.showinfo("Busy", "Wait for the running command to finish."); return
+        duration = _safe_float(self.sim_duration_var.get())
+        if not duration: messagebox.showwarning("Invalid duration", "Enter a positive number."); return
         sim_baud = self.sim_baud_var.get()
-        interval_map = {"1200": 1.0, "2400": 0.75, "4800": 0.5, "9600": 0.25}
-        keepalive_interval = interval_map.get(sim_baud, 0.5)
+        keepalive_interval = self.INTERVAL_MAP.get(sim_baud, 0.5)
         try:
             cutoff, maxc = self.get_profile_currents()
         except Exception as e:
@@ -304,9 +554,10 @@ class M18GUI(tk.Tk):
         )
         self.sim_thread.start()
 
-        self.sim_start_btn.configure(state="disabled")
-        self.sim_stop_btn.configure(state="normal")
-        self.sim_status_var.set(f"Simulation running ({pname}, baud {sim_baud})")
+        self._set_states([(self.sim_start_btn, "disabled"), (self.sim_stop_btn, "normal")] +
+                         [(b, "disabled") for b in self._cmd_btns()])
+        self.sim_tick_var.set("")
+        self.set_sim_status(f"Simulation running ({pname}, baud {sim_baud})")
 
         self.sim_log(
             f"Start {duration}s | {pname} | "
@@ -333,76 +584,78 @@ class M18GUI(tk.Tk):
         """Perform the scripted keepalive dialogue for the configured duration."""
         m = self.m18_obj
         if m is None:
-            self.after(
-                0,
-                lambda: messagebox.showerror(
-                    "Simulation error", "No active M18 connection."
-                ),
-            )
+            self._ui(messagebox.showerror, "Simulation error", "No active M18 connection.")
             return
 
-        old_cutoff = getattr(m, "CUTOFF_CURRENT", None)
-        old_max = getattr(m, "MAX_CURRENT", None)
-
-        m.CUTOFF_CURRENT = cutoff_raw
-        m.MAX_CURRENT = max_raw
-
-        start_time = time.time()
-
-        try:
-            self.after(0, lambda: self.sim_log("Resetting and negotiating charger state..."))
-
-            try:
-                m.reset()
-            except Exception as e:
-                self.after(0, lambda: self.sim_log(f"reset() failed: {e}"))
-                return
+        begin = time.monotonic()
+        deadline = begin + duration
 
+        with override_charger(m, ChargerOverride(cutoff_raw, max_raw)):
             try:
-                m.configure(2)
-                m.get_snapchat()
-                time.sleep(0.6)
-                m.keepalive()
-                m.configure(1)
-                m.get_snapchat()
-            except Exception as e:
-                self.after(0, lambda: self.sim_log(f"Initial negotiation failed: {e}"))
-                return
+                if not self._negotiate(m):
+                    return
+
+                # Absolute schedule so keepalive cadence does not drift; waiting on
+                # the stop event lets Stop interrupt the sleep immediately.
+                next_tick = time.monotonic() + interval
+                last_ui = float("-inf")
+                while True:
+                    now = time.monotonic()
+                    if now >= deadline:
+                        break
+                    # Never sleep past the deadline, and don't send a keepalive that would land after it.
+                    if self.sim_stop_event.wait(max(0.0, min(next_tick, deadline) - now)) or next_tick >= deadline:
+                        break
+                    next_tick = max(next_tick + interval, time.monotonic())
+
+                    try:
+                        m.keepalive()
+                        elapsed = time.monotonic() - begin
+                        if elapsed - last_ui >= 1.0:  # refresh the progress label at most once a second
+                            last_ui = elapsed
+                            self._ui(self.sim_tick_var.set, f"Last keepalive t={elapsed:.1f}s")
+                    except Exception as e:
+                        self._ui(self.sim_log, f"keepalive() failed: {e}")
+                        break
+
+            finally:
+                try:
+                    m.idle()
+                except Exception:
+                    pass
 
-            while not self.sim_stop_event.is_set():
-                elapsed = time.time() - start_time
-                if elapsed >= duration:
-                    break
+                # Queued behind the worker's log lines so they stay in order.
+                self._ui(self._sim_finished)
 
-                try:
-                    time.sleep(interval)
-                    m.keepalive()
-                    self.after(
-                        0,
-                        lambda e=elapsed: self.sim_log(f"Keepalive t={e:.1f}s"),
-                    )
-                except Exception as e:
-                    self.after(0, lambda: self.sim_log(f"keepalive() failed: {e}"))
-                    break
-
-        finally:
-            try:
-                m.idle()
-            except Exception:
-                pass
+    def _negotiate(self, m):
+        """Reset the pack and replay the charger handshake; ``False`` if it failed or Stop was pressed."""
+        self._ui(self.sim_log, "Resetting and negotiating charger state...")
 
-            if old_cutoff is not None:
-                m.CUTOFF_CURRENT = old_cutoff
-            if old_max is not None:
-                m.MAX_CURRENT = old_max
+        try:
+            m.reset()
+        except Exception as e:
+            self._ui(self.sim_log, f"reset() failed: {e}")
+            return False
 
-            def finish():
-                self.sim_log("Simulation finished. Returned to idle.")
-                self.sim_status_var.set("Simulation idle.")
-                self.sim_start_btn.configure(state="normal")
-                self.sim_stop_btn.configure(state="disabled")
+        try:
+            m.configure(2)
+            m.get_snapchat()
+            if self.sim_stop_event.wait(0.6):
+                return False
+            m.keepalive()
+            m.configure(1)
+            m.get_snapchat()
+        except Exception as e:
+            self._ui(self.sim_log, f"Initial negotiation failed: {e}")
+            return False
+        return True
 
-            self.after(0, finish)
+    def _sim_finished(self):
+        """Reset simulation controls once the worker has returned to idle."""
+        self.sim_log("Simulation finished. Returned to idle.")
+        self.set_sim_status("Simulation idle.")
+        for b in [self.sim_start_btn, *self._cmd_btns()]: self._release_cmd_btn(b)
+        self.sim_stop_btn.configure(state="disabled")
 
 
 if __name__ == "__main__":